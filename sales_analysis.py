@@ -1,3 +1,7 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 import altair as alt
@@ -12,54 +16,277 @@ st.title("📊 Sales Analysis Dashboard")
 # Abre sessão com Snowflake
 session = get_active_session()
 
+# Mapeamento fixo mês -> abreviação, criado uma única vez no import
+MONTH_NAMES = {
+    1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr', 5: 'May', 6: 'Jun',
+    7: 'Jul', 8: 'Aug', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'
+}
+
+# Colunas exibidas (e exportadas) na aba de dados brutos
+DISPLAY_COLUMNS = [
+    'DATA', 'PRODUCT_NAME', 'CATEGORY', 'STORE_CITY',
+    'SALESPERSON_NAME', 'QUANTIDADE_VENDIDA', 'TOTAL_VENDA'
+]
+
 # =============================================================================
-# Função para fazer os Joins de todas as tabelas dimensão com a fato no Snowflake
-# Otimização importante!! fazer o JOIN no banco ao invés de trazer tabelas separadas (bem mais performático)
+# Funções de carga de dados
+# Otimização importante!! fazer o JOIN e o WHERE no banco ao invés de trazer a
+# fato inteira para o Python (bem mais performático - só trafega o que passou
+# nos filtros e o Snowflake resolve os predicados no star-join)
 # =============================================================================
 
-@st.cache_data
-def load_sales_data():
+@st.cache_data(persist="disk")
+def load_filter_options(hour_bucket):
+    """
+    Carrega apenas os valores distintos de cada dimensão para popular os
+    filtros da sidebar, mais o intervalo de datas da fato.
+    Um SELECT DISTINCT por dimensão é muito mais barato que trazer a tabela
+    fato consolidada só para descobrir as opções dos widgets.
+
+    persist="disk" ignora o ttl do st.cache_data, então a expiração real vem
+    do hour_bucket (hora corrente): a chave de cache muda a cada hora e os
+    limites de data voltam a ser lidos do banco, mesmo depois de um restart.
+    """
+    # Uma query só (UNION ALL) ao invés de quatro round-trips; os valores já
+    # chegam ordenados do banco, sem sorted() em Python a cada rerun
+    options = session.sql("""
+        SELECT DISTINCT 'STORE_CITY' AS FILTER_NAME, CIDADE AS FILTER_VALUE
+        FROM dsa_db.schema3.dim_loja
+        UNION ALL
+        SELECT DISTINCT 'PRODUCT_NAME', NOME FROM dsa_db.schema3.dim_produto
+        UNION ALL
+        SELECT DISTINCT 'CATEGORY', CATEGORIA FROM dsa_db.schema3.dim_produto
+        UNION ALL
+        SELECT DISTINCT 'SALESPERSON_NAME', NOME FROM dsa_db.schema3.dim_vendedor
+        ORDER BY FILTER_NAME, FILTER_VALUE
+    """).to_pandas()
+    by_filter = {
+        name: group['FILTER_VALUE'].tolist()
+        for name, group in options.groupby('FILTER_NAME')
+    }
+    store_cities = by_filter.get('STORE_CITY', [])
+    products = by_filter.get('PRODUCT_NAME', [])
+    categories = by_filter.get('CATEGORY', [])
+    salespersons = by_filter.get('SALESPERSON_NAME', [])
+    date_bounds = session.sql(
+        "SELECT MIN(DATA) AS MIN_DATE, MAX(DATA) AS MAX_DATE FROM dsa_db.schema3.fato_venda"
+    ).to_pandas()
+    min_date = pd.to_datetime(date_bounds['MIN_DATE'].iloc[0])
+    max_date = pd.to_datetime(date_bounds['MAX_DATE'].iloc[0])
+    return store_cities, products, categories, salespersons, min_date, max_date
+
+
+@st.cache_data(ttl=3600, max_entries=16)
+def load_filtered(store_cities, products, categories, salespersons, date_from, date_to):
     """
-    Carrega dados já consolidados com JOIN de todas as dimensões.
-    Mais eficiente que carregar tabelas separadas e fazer JOIN em Python.
+    Carrega somente as linhas que passam nos filtros selecionados, aplicando
+    os WHERE direto no Snowflake com bind variables.
+    Os bytes transferidos caem na proporção da seletividade dos filtros e o
+    scan pesado fica no engine colunar, não no processo do Streamlit.
+
+    Cache só em memória, de propósito: com persist="disk" cada combinação de
+    filtros já tentada viraria um pickle sem expiração nem eviction no disco.
+    Quem amortiza o cold start é o cache em disco das opções da sidebar.
     """
+    # Projeta apenas as colunas que o dashboard realmente usa (projection
+    # pushdown) - menos colunas trafegadas e a dim_cliente nem precisa do JOIN
     query = """
-    SELECT 
-        fv.ID_TRANSACAO,
+    SELECT
         fv.DATA,
         fv.QUANTIDADE_VENDIDA,
         fv.TOTAL_VENDA,
-        dc.NOME AS CUSTOMER_NAME,
-        dc.CIDADE AS CUSTOMER_CITY,
-        dc.ESTADO AS CUSTOMER_STATE,
-        dl.NOME AS STORE_NAME,
         dl.CIDADE AS STORE_CITY,
-        dl.ESTADO AS STORE_STATE,
         dp.NOME AS PRODUCT_NAME,
-        dp.MARCA AS BRAND,
         dp.CATEGORIA AS CATEGORY,
         dv.NOME AS SALESPERSON_NAME,
-        dd.ANO AS YEAR,
-        dd.MES AS MONTH,
-        dd.DIA AS DAY
+        dd.MES AS MONTH
     FROM dsa_db.schema3.fato_venda fv
-    LEFT JOIN dsa_db.schema3.dim_cliente dc ON fv.CLIENTE = dc.ID_CLIENTE
     LEFT JOIN dsa_db.schema3.dim_loja dl ON fv.LOJA = dl.CODIGO
     LEFT JOIN dsa_db.schema3.dim_produto dp ON fv.PRODUTO = dp.CODIGO_SKU
     LEFT JOIN dsa_db.schema3.dim_vendedor dv ON fv.VENDEDOR = dv.MATRICULA
     LEFT JOIN dsa_db.schema3.dim_data dd ON fv.DATA = dd.DATA_COMPLETA
+    WHERE fv.DATA BETWEEN ? AND ?
     """
-    df = session.sql(query).to_pandas()
-    
-    # Converte data e cria colunas de período para análises temporais
+    params = [pd.to_datetime(date_from).date(), pd.to_datetime(date_to).date()]
+
+    # Monta os IN (...) dinamicamente, só para os filtros preenchidos
+    if store_cities:
+        query += f" AND dl.CIDADE IN ({', '.join('?' * len(store_cities))})"
+        params.extend(store_cities)
+    if products:
+        query += f" AND dp.NOME IN ({', '.join('?' * len(products))})"
+        params.extend(products)
+    if categories:
+        query += f" AND dp.CATEGORIA IN ({', '.join('?' * len(categories))})"
+        params.extend(categories)
+    if salespersons:
+        query += f" AND dv.NOME IN ({', '.join('?' * len(salespersons))})"
+        params.extend(salespersons)
+
+    # O resultado chega como Arrow; as opções abaixo vão direto para o
+    # pyarrow.Table.to_pandas: strings viram category sem passar por object
+    # dtype e a conversão não duplica o pico de memória
+    df = session.sql(query, params=params).to_pandas(
+        split_blocks=True,
+        self_destruct=True,
+        strings_to_categorical=True,
+    )
+
+    # strings_to_categorical age por batch do Arrow e o connector concatena os
+    # batches: se os dicionários diferem entre batches, o concat devolve as
+    # colunas como object de novo. Reaplicar o astype garante o invariante de
+    # dtype category (é no-op quando a coluna já chegou categórica).
+    for col in ['STORE_CITY', 'PRODUCT_NAME', 'CATEGORY', 'SALESPERSON_NAME']:
+        df[col] = df[col].astype('category')
+
+    # Converte data e cria colunas de período para análises temporais.
+    # MONTH_YEAR fica como int32 (meses desde a época): chave de groupby de
+    # 4 bytes ao invés dos 8 do datetime64; vira datetime de novo só nas
+    # poucas linhas já agregadas que vão para o gráfico.
     df['DATA'] = pd.to_datetime(df['DATA'])
-    df['MONTH_YEAR'] = df['DATA'].dt.to_period('M').astype(str)
+    df['MONTH_YEAR'] = df['DATA'].to_numpy().astype('datetime64[M]').astype(np.int32)
     df['QUARTER'] = df['DATA'].dt.quarter
-    
+
+    # Reduz a largura dos inteiros: metade (ou 1/8) dos bytes percorridos em
+    # cada sum/groupby. TOTAL_VENDA fica em float64 para não perder centavos
+    # nos somatórios de receita.
+    df['QUANTIDADE_VENDIDA'] = df['QUANTIDADE_VENDIDA'].astype('int32')
+    df[['MONTH', 'QUARTER']] = df[['MONTH', 'QUARTER']].astype('int8')
+
     return df
 
-with st.spinner('Loading data...'):
-    df_sales = load_sales_data()
+# =============================================================================
+# Agregações memoizadas
+# Cada agregação é cacheada pela tupla de filtros (filters_key): repetir uma
+# interação com os mesmos filtros vira cache hit ao invés de refazer o groupby
+# sobre todas as linhas. load_filtered também é cacheada, então a chamada
+# interna não refaz a query.
+#
+# Para não varrer a coluna TOTAL_VENDA oito vezes (uma por gráfico), uma única
+# pré-agregação na chave mais fina percorre os dados uma vez só; cada gráfico
+# faz o roll-up em cima desse resultado, que é ordens de grandeza menor.
+# =============================================================================
+
+@st.cache_data(max_entries=64, ttl=3600, show_spinner=False)
+def base_aggregation(filters_key):
+    """
+    Pré-agregação única na chave mais fina usada pelos gráficos.
+    CATEGORY depende de PRODUCT_NAME e MONTH/QUARTER de MONTH_YEAR, então
+    entram de carona na chave sem aumentar a cardinalidade. Um único scan da
+    fato filtrada alimenta todos os roll-ups.
+    """
+    df = load_filtered(*filters_key)
+    return (
+        df.groupby([
+            'PRODUCT_NAME', 'CATEGORY', 'STORE_CITY',
+            'SALESPERSON_NAME', 'MONTH', 'QUARTER', 'MONTH_YEAR'
+        ], observed=True, sort=False)['TOTAL_VENDA']
+        .sum()
+        .reset_index()
+    )
+
+
+@st.cache_data(max_entries=64, ttl=3600, show_spinner=False)
+def agg_by_product(filters_key):
+    """Top 10 produtos por receita."""
+    base = base_aggregation(filters_key)
+    return (
+        base.groupby('PRODUCT_NAME', observed=True, sort=False)['TOTAL_VENDA']
+        .sum()
+        .nlargest(10)
+        .reset_index()
+    )
+
+
+@st.cache_data(max_entries=64, ttl=3600, show_spinner=False)
+def agg_by_category(filters_key):
+    """Receita total por categoria."""
+    base = base_aggregation(filters_key)
+    return base.groupby('CATEGORY', observed=True, sort=False)['TOTAL_VENDA'].sum().reset_index()
+
+
+@st.cache_data(max_entries=64, ttl=3600, show_spinner=False)
+def agg_monthly_by_city(filters_key):
+    """Receita mensal por cidade da loja (série temporal)."""
+    base = base_aggregation(filters_key)
+    monthly = base.groupby(['MONTH_YEAR', 'STORE_CITY'], observed=True, sort=False)['TOTAL_VENDA'].sum().reset_index()
+    # Decodifica o int32 de volta para datetime (eixo temporal do Altair)
+    monthly['MONTH_YEAR'] = monthly['MONTH_YEAR'].to_numpy().astype('int64').astype('datetime64[M]')
+    return monthly
+
+
+@st.cache_data(max_entries=64, ttl=3600, show_spinner=False)
+def top_salespersons(filters_key):
+    """Top 10 vendedores por receita."""
+    base = base_aggregation(filters_key)
+    return (
+        base.groupby('SALESPERSON_NAME', observed=True, sort=False)['TOTAL_VENDA']
+        .sum()
+        .nlargest(10)
+        .reset_index()
+    )
+
+
+@st.cache_data(max_entries=64, ttl=3600, show_spinner=False)
+def top_stores(filters_key):
+    """Top 10 lojas (por cidade) por receita."""
+    base = base_aggregation(filters_key)
+    return (
+        base.groupby('STORE_CITY', observed=True, sort=False)['TOTAL_VENDA']
+        .sum()
+        .nlargest(10)
+        .reset_index()
+    )
+
+
+@st.cache_data(max_entries=64, ttl=3600, show_spinner=False)
+def monthly_pattern(filters_key):
+    """Receita agregada por mês do ano (sazonalidade)."""
+    base = base_aggregation(filters_key)
+    pattern = base.groupby('MONTH', observed=True, sort=False)['TOTAL_VENDA'].sum().reset_index()
+    pattern['MONTH_NAME'] = pattern['MONTH'].map(MONTH_NAMES)
+    return pattern
+
+
+@st.cache_data(max_entries=64, ttl=3600, show_spinner=False)
+def quarterly_sales(filters_key):
+    """Receita agregada por trimestre."""
+    base = base_aggregation(filters_key)
+    quarterly = base.groupby('QUARTER', observed=True, sort=False)['TOTAL_VENDA'].sum().reset_index()
+    quarterly['QUARTER_NAME'] = 'Q' + quarterly['QUARTER'].astype(str)
+    return quarterly
+
+
+@st.cache_data(max_entries=64, ttl=3600, show_spinner=False)
+def pareto_products(filters_key):
+    """Receita por produto com percentual acumulado (análise de Pareto)."""
+    base = base_aggregation(filters_key)
+    totals = base.groupby('PRODUCT_NAME', observed=True, sort=False)['TOTAL_VENDA'].sum()
+
+    # Kernel todo em NumPy: argsort decrescente + take + cumsum num fluxo só,
+    # sem o sort_values/reset_index do pandas realocando o frame no meio
+    vals = totals.to_numpy()
+    order = np.argsort(-vals)
+    sorted_vals = vals[order]
+    cumulative = np.cumsum(sorted_vals)
+    return pd.DataFrame({
+        'PRODUCT_NAME': totals.index.take(order),
+        'TOTAL_VENDA': sorted_vals,
+        'CUMULATIVE_SALES': cumulative,
+        'CUMULATIVE_PERCENTAGE': cumulative * (100.0 / sorted_vals.sum()),
+        'PRODUCT_NUMBER': np.arange(1, len(sorted_vals) + 1),
+    })
+
+
+@st.cache_data(max_entries=16, ttl=3600)
+def filtered_csv(filters_key):
+    """
+    CSV dos dados filtrados para o botão de download.
+    Cacheado pela tupla de filtros: a serialização (cara, linha a linha em
+    Python) só roda quando o filtro muda, não a cada rerun do script.
+    """
+    df = load_filtered(*filters_key)
+    return df[DISPLAY_COLUMNS].to_csv(index=False).encode('utf-8')
 
 # =============================================================================
 # FILTROS LATERAIS (SIDEBAR)
@@ -67,40 +294,41 @@ with st.spinner('Loading data...'):
 # Os filtros são aplicados em todas as visualizações do dashboard
 # =============================================================================
 
+# O bucket horário rotaciona o cache em disco das opções (ver docstring)
+store_options, product_options, category_options, salesperson_options, min_date, max_date = load_filter_options(int(time.time() // 3600))
+
 st.sidebar.title("🔍 Filters")
 
 # Filtro por cidade da loja
 store_filter = st.sidebar.multiselect(
     "Store City:",
-    options=sorted(df_sales["STORE_CITY"].unique()),
+    options=store_options,
     default=None
 )
 
 # Filtro por produto
 product_filter = st.sidebar.multiselect(
     "Product:",
-    options=sorted(df_sales["PRODUCT_NAME"].unique()),
+    options=product_options,
     default=None
 )
 
 # Filtro por categoria
 category_filter = st.sidebar.multiselect(
     "Category:",
-    options=sorted(df_sales["CATEGORY"].unique()),
+    options=category_options,
     default=None
 )
 
 # Filtro por vendedor
 salesperson_filter = st.sidebar.multiselect(
     "Salesperson:",
-    options=sorted(df_sales["SALESPERSON_NAME"].unique()),
+    options=salesperson_options,
     default=None
 )
 
 # Filtro por intervalo de datas
 st.sidebar.subheader("Date Range")
-min_date = df_sales['DATA'].min()
-max_date = df_sales['DATA'].max()
 date_range = st.sidebar.date_input(
     "Select period:",
     value=(min_date, max_date),
@@ -109,24 +337,53 @@ date_range = st.sidebar.date_input(
 )
 
 # ===================================================================
-# Aplica todos os filtros selecionados pelo usuário no dataset
+# Carrega do Snowflake somente os dados que passam nos filtros
 # ====================================================================
 
-df_filtered = df_sales.copy()
-
-if store_filter:
-    df_filtered = df_filtered[df_filtered["STORE_CITY"].isin(store_filter)]
-if product_filter:
-    df_filtered = df_filtered[df_filtered["PRODUCT_NAME"].isin(product_filter)]
-if category_filter:
-    df_filtered = df_filtered[df_filtered["CATEGORY"].isin(category_filter)]
-if salesperson_filter:
-    df_filtered = df_filtered[df_filtered["SALESPERSON_NAME"].isin(salesperson_filter)]
 if len(date_range) == 2:
-    df_filtered = df_filtered[
-        (df_filtered['DATA'] >= pd.to_datetime(date_range[0])) &
-        (df_filtered['DATA'] <= pd.to_datetime(date_range[1]))
-    ]
+    date_from, date_to = date_range
+else:
+    date_from, date_to = min_date, max_date
+
+# Tupla hashable que identifica o conjunto de filtros - é a chave de cache
+# tanto de load_filtered quanto de cada agregação memoizada
+filters_key = (
+    tuple(store_filter),
+    tuple(product_filter),
+    tuple(category_filter),
+    tuple(salesperson_filter),
+    date_from,
+    date_to
+)
+
+with st.spinner('Loading data...'):
+    df_filtered = load_filtered(*filters_key)
+
+# =============================================================================
+# Calcula as agregações de todos os gráficos em paralelo: são independentes
+# entre si e o pandas solta o GIL nos caminhos C de agregação, então as
+# threads se sobrepõem em deploys multi-core. A pré-agregação é aquecida
+# antes, senão as threads recomputariam a mesma base ao mesmo tempo.
+# Em reruns com o mesmo filtro tudo isso é cache hit imediato.
+# =============================================================================
+
+base_aggregation(filters_key)
+
+with ThreadPoolExecutor(max_workers=4) as executor:
+    agg_futures = {
+        name: executor.submit(agg_fn, filters_key)
+        for name, agg_fn in [
+            ('product', agg_by_product),
+            ('category', agg_by_category),
+            ('monthly', agg_monthly_by_city),
+            ('salespersons', top_salespersons),
+            ('stores', top_stores),
+            ('pattern', monthly_pattern),
+            ('quarterly', quarterly_sales),
+            ('pareto', pareto_products),
+        ]
+    }
+    aggs = {name: future.result() for name, future in agg_futures.items()}
 
 # =============================================================================
 # INDICADORES DE PERFORMANCE (KPIs)
@@ -168,8 +425,7 @@ col_left, col_right = st.columns(2)
 with col_left:
     st.subheader("Total Sales by Product")
     
-    product_sales = df_filtered.groupby('PRODUCT_NAME')['TOTAL_VENDA'].sum().reset_index()
-    product_sales = product_sales.sort_values('TOTAL_VENDA', ascending=False).head(10)
+    product_sales = aggs['product']
     
     chart_product = (
         alt.Chart(product_sales)
@@ -195,7 +451,7 @@ with col_left:
 with col_right:
     st.subheader("Total Sales by Category")
     
-    category_sales = df_filtered.groupby('CATEGORY')['TOTAL_VENDA'].sum().reset_index()
+    category_sales = aggs['category']
     
     chart_category = (
         alt.Chart(category_sales)
@@ -221,7 +477,7 @@ st.divider()
 
 st.subheader("Sales Trend Over Time")
 
-monthly_sales = df_filtered.groupby(['MONTH_YEAR', 'STORE_CITY'])['TOTAL_VENDA'].sum().reset_index()
+monthly_sales = aggs['monthly']
 
 chart_time = (
     alt.Chart(monthly_sales)
@@ -266,16 +522,10 @@ with tab1:
     # Top 10 Vendedores
     with col_a:
         st.subheader("Top 10 Salespersons")
-        top_salespersons = (
-            df_filtered.groupby('SALESPERSON_NAME')['TOTAL_VENDA']
-            .sum()
-            .sort_values(ascending=False)
-            .head(10)
-            .reset_index()
-        )
-        
+        df_top_salespersons = aggs['salespersons']
+
         chart_salespersons = (
-            alt.Chart(top_salespersons)
+            alt.Chart(df_top_salespersons)
             .mark_bar()
             .encode(
                 x=alt.X('TOTAL_VENDA:Q', title='Total Sales (R$)'),
@@ -293,16 +543,10 @@ with tab1:
     # Top 10 Lojas (por cidade)
     with col_b:
         st.subheader("Top 10 Stores")
-        top_stores = (
-            df_filtered.groupby('STORE_CITY')['TOTAL_VENDA']
-            .sum()
-            .sort_values(ascending=False)
-            .head(10)
-            .reset_index()
-        )
-        
+        df_top_stores = aggs['stores']
+
         chart_stores = (
-            alt.Chart(top_stores)
+            alt.Chart(df_top_stores)
             .mark_bar()
             .encode(
                 x=alt.X('TOTAL_VENDA:Q', title='Total Sales (R$)'),
@@ -322,22 +566,14 @@ with tab1:
 # Analisa padrões de vendas ao longo dos meses e trimestres (util para identificar períodos de alta/baixa demanda)
 # -----------------------------------------------------------------------------
 
-    with tab2:
+with tab2:
     # Padrão Mensal (agregado de todos os anos)
     st.subheader("Monthly Sales Pattern")
     
-    monthly_pattern = (
-        df_filtered.groupby('MONTH')['TOTAL_VENDA']
-        .sum()
-        .reset_index()
-    )
-    monthly_pattern['MONTH_NAME'] = monthly_pattern['MONTH'].map({
-        1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr', 5: 'May', 6: 'Jun',
-        7: 'Jul', 8: 'Aug', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'
-    })
-    
+    df_monthly_pattern = aggs['pattern']
+
     chart_seasonality = (
-        alt.Chart(monthly_pattern)
+        alt.Chart(df_monthly_pattern)
         .mark_line(point=True, size=3)
         .encode(
             x=alt.X('MONTH:O', title='Month', axis=alt.Axis(labelExpr="datum.value == 1 ? 'Jan' : datum.value == 2 ? 'Feb' : datum.value == 3 ? 'Mar' : datum.value == 4 ? 'Apr' : datum.value == 5 ? 'May' : datum.value == 6 ? 'Jun' : datum.value == 7 ? 'Jul' : datum.value == 8 ? 'Aug' : datum.value == 9 ? 'Sep' : datum.value == 10 ? 'Oct' : datum.value == 11 ? 'Nov' : 'Dec'")),
@@ -353,15 +589,10 @@ with tab1:
     
     # Análise Trimestral
     st.subheader("Quarterly Sales")
-    quarterly_sales = (
-        df_filtered.groupby('QUARTER')['TOTAL_VENDA']
-        .sum()
-        .reset_index()
-    )
-    quarterly_sales['QUARTER_NAME'] = 'Q' + quarterly_sales['QUARTER'].astype(str)
-    
+    df_quarterly_sales = aggs['quarterly']
+
     chart_quarterly = (
-        alt.Chart(quarterly_sales)
+        alt.Chart(df_quarterly_sales)
         .mark_bar()
         .encode(
             x=alt.X('QUARTER_NAME:N', title='Quarter', sort=['Q1', 'Q2', 'Q3', 'Q4']),
@@ -383,24 +614,19 @@ with tab1:
 # Auxilia na identificação dos produtos chave para p negócio
 # -----------------------------------------------------------------------------
 
-    with tab3:
+with tab3:
     st.subheader("Pareto Analysis - Products (80/20 Rule)")
     
-    # Calcula percentual acumulado
-    pareto_products = (
-        df_filtered.groupby('PRODUCT_NAME')['TOTAL_VENDA']
-        .sum()
-        .sort_values(ascending=False)
-        .reset_index()
-    )
-    pareto_products['CUMULATIVE_SALES'] = pareto_products['TOTAL_VENDA'].cumsum()
-    pareto_products['CUMULATIVE_PERCENTAGE'] = (
-        pareto_products['CUMULATIVE_SALES'] / pareto_products['TOTAL_VENDA'].sum() * 100
-    )
-    pareto_products['PRODUCT_NUMBER'] = range(1, len(pareto_products) + 1)
-    
+    # Percentual acumulado já vem calculado da agregação memoizada
+    df_pareto = aggs['pareto']
+
+    # Manda ao navegador só o topo do ranking e as colunas que o gráfico
+    # codifica - a cauda longa não rende nem 1 pixel e só inflaria o JSON
+    # serializado no websocket
+    pareto_chart_source = df_pareto.head(100).drop(columns='CUMULATIVE_SALES')
+
     # Gráfico com eixos duplos (barras + linha)
-    base = alt.Chart(pareto_products).encode(
+    base = alt.Chart(pareto_chart_source).encode(
         x=alt.X('PRODUCT_NUMBER:O', title='Product Rank')
     )
     
@@ -426,27 +652,25 @@ with tab1:
     chart_pareto = alt.layer(bars, line, rule).resolve_scale(y='independent').properties(height=400)
     st.altair_chart(chart_pareto, use_container_width=True)
     
-    # Insight: quantos produtos representam 80% das vendas
-    products_80 = pareto_products[pareto_products['CUMULATIVE_PERCENTAGE'] <= 80]
-    st.info(f"💡 **Insight:** {len(products_80)} products ({len(products_80)/len(pareto_products)*100:.1f}%) generate 80% of total sales.")
+    # Insight: quantos produtos representam 80% das vendas.
+    # O percentual acumulado é crescente, então uma busca binária substitui
+    # a máscara booleana sobre a coluna inteira
+    n_products_80 = int(np.searchsorted(
+        df_pareto['CUMULATIVE_PERCENTAGE'].to_numpy(), 80.0, side='right'
+    ))
+    st.info(f"💡 **Insight:** {n_products_80} products ({n_products_80/len(df_pareto)*100:.1f}%) generate 80% of total sales.")
 
 # -----------------------------------------------------------------------------
 # ABA 4: Dados Brutos
 # Exibe tabela com dados filtrados e botão para download em CSV
 # -----------------------------------------------------------------------------
 
-    with tab4:
+with tab4:
     st.subheader("Sales Data Table")
     
-    # Seleciona as colunas relevantes para exibição
-    display_columns = [
-        'DATA', 'PRODUCT_NAME', 'CATEGORY', 'STORE_CITY',
-        'SALESPERSON_NAME', 'QUANTIDADE_VENDIDA', 'TOTAL_VENDA'
-    ]
-    
     # Exibe dataframe formatado
     st.dataframe(
-        df_filtered[display_columns].style.format({
+        df_filtered[DISPLAY_COLUMNS].style.format({
             'TOTAL_VENDA': 'R$ {:,.2f}',
             'QUANTIDADE_VENDIDA': '{:,}'
         }),
@@ -454,8 +678,8 @@ with tab1:
         height=400
     )
     
-    # Botão de download
-    csv = df_filtered[display_columns].to_csv(index=False).encode('utf-8')
+    # Botão de download - o CSV cacheado só é regenerado quando o filtro muda
+    csv = filtered_csv(filters_key)
     st.download_button(
         label="📥 Download CSV",
         data=csv,